@@ -0,0 +1,88 @@
+"""
+Disk-backed TTL cache for Yahoo Finance responses.
+
+Sits underneath Streamlit's in-memory caches so that cold starts and other
+server processes can reuse recent responses instead of going to the network.
+
+Layout:
+    .cache/{SYMBOL}/{endpoint}_{md5(params)}.json      (dicts, embedded timestamp)
+    .cache/{SYMBOL}/{endpoint}_{md5(params)}.parquet   (DataFrames, file mtime)
+"""
+
+import hashlib
+import json
+import os
+import re
+import tempfile
+import time
+from pathlib import Path
+from typing import Optional, Dict, Any, Callable
+
+import pandas as pd
+
+
+class FileCache:
+    """JSON / Parquet file cache keyed by (symbol, endpoint, params)."""
+
+    def __init__(self, root: str = ".cache"):
+        self.root = Path(root)
+
+    def _path(self, symbol: str, endpoint: str, params: Dict[str, Any], suffix: str) -> Path:
+        # Tickers come straight from user input, so keep them to a safe alphabet
+        safe_symbol = re.sub(r"[^A-Z0-9^=-]", "_", symbol.upper()) or "_"
+        digest = hashlib.md5(json.dumps(params, sort_keys=True).encode()).hexdigest()
+        return self.root / safe_symbol / f"{endpoint}_{digest}.{suffix}"
+
+    def _write_atomic(self, path: Path, write: Callable[[str], None]) -> None:
+        """Write via a temp file + rename so concurrent readers never see partial files."""
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+            os.close(fd)
+            try:
+                write(tmp_path)
+                os.replace(tmp_path, path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+        except Exception:
+            # The cache is best-effort; a failed write just means a future miss
+            pass
+
+    def get_json(self, symbol: str, endpoint: str, params: Dict[str, Any], ttl: float) -> Optional[Dict[str, Any]]:
+        """Return the cached dict if present and younger than ttl seconds."""
+        path = self._path(symbol, endpoint, params, "json")
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+        except Exception:
+            return None
+        if time.time() - entry.get("timestamp", 0) > ttl:
+            return None
+        return entry.get("data")
+
+    def set_json(self, symbol: str, endpoint: str, params: Dict[str, Any], data: Dict[str, Any]) -> None:
+        """Store a JSON-serializable dict with the current timestamp."""
+        path = self._path(symbol, endpoint, params, "json")
+        entry = {"timestamp": time.time(), "data": data}
+
+        def write(tmp_path: str) -> None:
+            with open(tmp_path, "w") as f:
+                json.dump(entry, f)
+
+        self._write_atomic(path, write)
+
+    def get_frame(self, symbol: str, endpoint: str, params: Dict[str, Any], ttl: float) -> Optional[pd.DataFrame]:
+        """Return the cached DataFrame if present and younger than ttl seconds."""
+        path = self._path(symbol, endpoint, params, "parquet")
+        try:
+            if time.time() - path.stat().st_mtime > ttl:
+                return None
+            return pd.read_parquet(path)
+        except Exception:
+            return None
+
+    def set_frame(self, symbol: str, endpoint: str, params: Dict[str, Any], frame: pd.DataFrame) -> None:
+        """Store a DataFrame as Parquet."""
+        path = self._path(symbol, endpoint, params, "parquet")
+        self._write_atomic(path, frame.to_parquet)
@@ -6,7 +6,7 @@ Clean, minimal design inspired by Bear Blog with 80s typography.
 Features waterfall chart for proceeds and lookback highlighting.
 
 Setup:
-    pip install streamlit yfinance plotly pandas python-dateutil
+    pip install streamlit yfinance pandas numpy pyarrow
 
 Run:
     streamlit run espp_app.py
@@ -15,11 +15,17 @@ Run:
 import streamlit as st
 import yfinance as yf
 import pandas as pd
-import plotly.graph_objects as go
-from datetime import datetime, timedelta
-from dateutil.relativedelta import relativedelta
-from typing import Optional, Dict, Any
+import numpy as np
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from typing import Optional, Dict, Any, List, Tuple, NamedTuple, Final
 import math
+import calendar
+import time
+import textwrap
+
+from cache import FileCache
+from styles import get_css
 
 # ============================================================
 # Page Configuration
@@ -31,446 +37,334 @@ st.set_page_config(
     initial_sidebar_state="collapsed"
 )
 
-# ============================================================
-# Custom CSS - Clean Minimal Design
-# ============================================================
-def get_css(dark_mode: bool) -> str:
-    if dark_mode:
-        return """
-        <style>
-            @import url('https://fonts.googleapis.com/css2?family=VT323&family=Space+Mono:wght@400;700&display=swap');
-            
-            :root {
-                --bg: #1a1a1a;
-                --card: #252525;
-                --text: #e0e0e0;
-                --text-muted: #888888;
-                --accent: #39ff14;
-                --accent-alt: #4ecdc4;
-                --border: #333333;
-                --bar-base: #444444;
-            }
-            
-            .stApp {
-                background-color: var(--bg);
-            }
-            
-            .main-header {
-                font-family: 'VT323', monospace;
-                font-size: 36px;
-                letter-spacing: 2px;
-                color: var(--text);
-                margin-bottom: 4px;
-            }
-            
-            .sub-header {
-                color: var(--text-muted);
-                font-size: 14px;
-                margin-bottom: 24px;
-            }
-            
-            .card {
-                background: var(--card);
-                border: 2px solid var(--border);
-                padding: 20px;
-                margin-bottom: 16px;
-                transition: all 0.3s ease;
-            }
-            
-            .card:hover {
-                border-color: var(--accent);
-            }
-            
-            .card-highlight {
-                border: 2px solid var(--accent-alt) !important;
-                position: relative;
-            }
-            
-            .lookback-badge {
-                background: var(--accent-alt);
-                color: #1a1a1a;
-                font-size: 10px;
-                padding: 2px 8px;
-                letter-spacing: 1px;
-                font-family: 'Space Mono', monospace;
-                position: absolute;
-                top: -10px;
-                left: 12px;
-            }
-            
-            .big-number {
-                font-family: 'Space Mono', monospace;
-                font-size: 48px;
-                font-weight: 700;
-                line-height: 1;
-                letter-spacing: -2px;
-                color: var(--text);
-            }
-            
-            .medium-number {
-                font-family: 'Space Mono', monospace;
-                font-size: 28px;
-                font-weight: 700;
-                color: var(--text);
-            }
-            
-            .small-number {
-                font-family: 'Space Mono', monospace;
-                font-size: 18px;
-                font-weight: 700;
-            }
-            
-            .label {
-                font-size: 14px;
-                text-transform: uppercase;
-                letter-spacing: 2px;
-                color: var(--text-muted);
-                margin-bottom: 4px;
-            }
-            
-            .highlight {
-                color: var(--accent) !important;
-            }
-            
-            .highlight-alt {
-                color: var(--accent-alt) !important;
-            }
-            
-            .divider {
-                border: none;
-                border-top: 1px dashed var(--border);
-                margin: 16px 0;
-            }
-            
-            .inline-stat {
-                display: flex;
-                justify-content: space-between;
-                padding: 8px 0;
-                border-bottom: 1px dotted var(--border);
-                color: var(--text);
-            }
-            
-            .inline-stat:last-child {
-                border-bottom: none;
-            }
-            
-            .tag {
-                display: inline-block;
-                padding: 4px 12px;
-                font-size: 12px;
-                text-transform: uppercase;
-                letter-spacing: 1px;
-                border: 1px solid currentColor;
-                color: var(--accent-alt);
-            }
-            
-            .progress-container {
-                height: 8px;
-                background: var(--border);
-                overflow: hidden;
-                margin-top: 8px;
-            }
-            
-            .progress-fill {
-                height: 100%;
-                background: var(--accent);
-            }
-            
-            .footer {
-                text-align: center;
-                color: var(--text-muted);
-                font-size: 12px;
-                margin-top: 32px;
-                padding-top: 16px;
-                border-top: 1px solid var(--border);
-            }
-            
-            .footer-brand {
-                font-family: 'VT323', monospace;
-                font-size: 16px;
-                margin-top: 8px;
-            }
-            
-            /* Hide Streamlit elements */
-            #MainMenu {visibility: hidden;}
-            footer {visibility: hidden;}
-            .stDeployButton {display: none;}
-            
-            /* Style inputs */
-            .stTextInput input, .stNumberInput input, .stSelectbox select {
-                background-color: var(--card) !important;
-                color: var(--text) !important;
-                border: 2px solid var(--border) !important;
-                font-family: 'Space Mono', monospace !important;
-            }
-            
-            .stDateInput input {
-                background-color: var(--card) !important;
-                color: var(--text) !important;
-                border: 2px solid var(--border) !important;
-            }
-        </style>
-        """
-    else:
-        return """
-        <style>
-            @import url('https://fonts.googleapis.com/css2?family=VT323&family=Space+Mono:wght@400;700&display=swap');
-            
-            :root {
-                --bg: #fafafa;
-                --card: #ffffff;
-                --text: #2d2d2d;
-                --text-muted: #666666;
-                --accent: #32cd32;
-                --accent-alt: #2a9d8f;
-                --border: #e0e0e0;
-                --bar-base: #e0e0e0;
-            }
-            
-            .stApp {
-                background-color: var(--bg);
-            }
-            
-            .main-header {
-                font-family: 'VT323', monospace;
-                font-size: 36px;
-                letter-spacing: 2px;
-                color: var(--text);
-                margin-bottom: 4px;
-            }
-            
-            .sub-header {
-                color: var(--text-muted);
-                font-size: 14px;
-                margin-bottom: 24px;
-            }
-            
-            .card {
-                background: var(--card);
-                border: 2px solid var(--border);
-                padding: 20px;
-                margin-bottom: 16px;
-                transition: all 0.3s ease;
-            }
-            
-            .card:hover {
-                border-color: var(--accent);
-            }
-            
-            .card-highlight {
-                border: 2px solid var(--accent-alt) !important;
-                position: relative;
-            }
-            
-            .lookback-badge {
-                background: var(--accent-alt);
-                color: #ffffff;
-                font-size: 10px;
-                padding: 2px 8px;
-                letter-spacing: 1px;
-                font-family: 'Space Mono', monospace;
-                position: absolute;
-                top: -10px;
-                left: 12px;
-            }
-            
-            .big-number {
-                font-family: 'Space Mono', monospace;
-                font-size: 48px;
-                font-weight: 700;
-                line-height: 1;
-                letter-spacing: -2px;
-                color: var(--text);
-            }
-            
-            .medium-number {
-                font-family: 'Space Mono', monospace;
-                font-size: 28px;
-                font-weight: 700;
-                color: var(--text);
-            }
-            
-            .small-number {
-                font-family: 'Space Mono', monospace;
-                font-size: 18px;
-                font-weight: 700;
-            }
-            
-            .label {
-                font-size: 14px;
-                text-transform: uppercase;
-                letter-spacing: 2px;
-                color: var(--text-muted);
-                margin-bottom: 4px;
-            }
-            
-            .highlight {
-                color: var(--accent) !important;
-            }
-            
-            .highlight-alt {
-                color: var(--accent-alt) !important;
-            }
-            
-            .divider {
-                border: none;
-                border-top: 1px dashed var(--border);
-                margin: 16px 0;
-            }
-            
-            .inline-stat {
-                display: flex;
-                justify-content: space-between;
-                padding: 8px 0;
-                border-bottom: 1px dotted var(--border);
-                color: var(--text);
-            }
-            
-            .inline-stat:last-child {
-                border-bottom: none;
-            }
-            
-            .tag {
-                display: inline-block;
-                padding: 4px 12px;
-                font-size: 12px;
-                text-transform: uppercase;
-                letter-spacing: 1px;
-                border: 1px solid currentColor;
-                color: var(--accent-alt);
-            }
-            
-            .progress-container {
-                height: 8px;
-                background: var(--border);
-                overflow: hidden;
-                margin-top: 8px;
-            }
-            
-            .progress-fill {
-                height: 100%;
-                background: var(--accent);
-            }
-            
-            .footer {
-                text-align: center;
-                color: var(--text-muted);
-                font-size: 12px;
-                margin-top: 32px;
-                padding-top: 16px;
-                border-top: 1px solid var(--border);
-            }
-            
-            .footer-brand {
-                font-family: 'VT323', monospace;
-                font-size: 16px;
-                margin-top: 8px;
-            }
-            
-            /* Hide Streamlit elements */
-            #MainMenu {visibility: hidden;}
-            footer {visibility: hidden;}
-            .stDeployButton {display: none;}
-        </style>
-        """
-
 # ============================================================
 # Constants
 # ============================================================
 IRS_LIMIT = 25000
 
+# Inline-style colours for the proceeds bar and its legend, keyed by dark_mode.
+# Mirrors --bar-base, --accent, --text-muted and --badge-text in the CSS palettes.
+BAR_COLORS: Final[Dict[bool, Dict[str, str]]] = {
+    True: {'cost': '#444444', 'gain': '#39ff14', 'text_cost': '#888888', 'text_gain': '#1a1a1a'},
+    False: {'cost': '#e0e0e0', 'gain': '#32cd32', 'text_cost': '#666666', 'text_gain': '#ffffff'},
+}
+
+# In-memory TTL (seconds) of the quote and history fetchers
+FETCH_TTL = 5 * 60
+
+# Disk cache TTLs (seconds) - checked when the in-memory st.cache_data misses
+QUOTE_TTL = 5 * 60
+HISTORY_TTL = 6 * 60 * 60
+NAME_TTL = 7 * 24 * 60 * 60
+NAME_FALLBACK_TTL = 60 * 60
+
+file_cache = FileCache()
+
 # ============================================================
 # Data Fetching Functions
 # ============================================================
-@st.cache_data(ttl=300)
-def fetch_stock_data(symbol: str) -> Optional[Dict[str, Any]]:
-    """Fetch current stock data using yfinance."""
+# The _load_* functions do the disk cache and network work behind the cached
+# fetchers. They make no Streamlit calls, so fetch_all can run them on worker
+# threads without a script run context. Each builds its own yf.Ticker: yfinance
+# already shares one HTTP session between Tickers, and a Ticker's history
+# metadata is mutable state that concurrent calls would overwrite.
+def _load_company_name(symbol: str) -> str:
+    """Load the company name, which only lives in the heavy .info payload."""
+    cached = file_cache.get_json(symbol, "name", {}, NAME_TTL)
+    if cached is None:
+        # A failed lookup is cached too, for less time, so a quote miss doesn't
+        # repeat the .info scrape
+        cached = file_cache.get_json(symbol, "name", {"fallback": True}, NAME_FALLBACK_TTL)
+    if cached is not None:
+        return cached["name"]
+    
     try:
-        ticker = yf.Ticker(symbol)
-        info = ticker.info
+        info = yf.Ticker(symbol).info
+        name = info.get("longName") or info.get("shortName")
+    except Exception:
+        name = None
+    
+    if not name:
+        name = symbol.upper()
+        file_cache.set_json(symbol, "name", {"fallback": True}, {"name": name})
+        return name
+    file_cache.set_json(symbol, "name", {}, {"name": name})
+    return name
+
+
+def _load_stock_data(symbol: str) -> Optional[Dict[str, Any]]:
+    """Load current stock data using yfinance."""
+    cached = file_cache.get_json(symbol, "quote", {}, QUOTE_TTL)
+    if cached is not None:
+        return cached
+    
+    try:
+        # fast_info skips the .info scrape but is not one request: last_price
+        # downloads a 1y daily chart (unadjusted, so not shared with the history
+        # fetch) and previous_close a 5d hourly pre/post-market chart
+        fast_info = yf.Ticker(symbol).fast_info
         
-        current_price = info.get("currentPrice") or info.get("regularMarketPrice")
-        previous_close = info.get("previousClose") or info.get("regularMarketPreviousClose")
+        current_price = fast_info.last_price
+        previous_close = fast_info.previous_close
         
-        if not current_price:
+        if not current_price or math.isnan(current_price):
             return None
+        if previous_close and math.isnan(previous_close):
+            previous_close = None
         
         day_change = current_price - previous_close if previous_close else 0
         day_change_pct = (day_change / previous_close * 100) if previous_close else 0
         
-        return {
+        stock_data = {
             "symbol": symbol.upper(),
-            "companyName": info.get("longName") or info.get("shortName", symbol.upper()),
-            "currentPrice": current_price,
-            "previousClose": previous_close,
-            "dayChange": round(day_change, 2),
-            "dayChangePercent": round(day_change_pct, 2),
+            "companyName": _load_company_name(symbol),
+            "currentPrice": float(current_price),
+            "previousClose": float(previous_close) if previous_close else None,
+            "dayChange": float(day_change),
+            "dayChangePercent": float(day_change_pct),
         }
+        file_cache.set_json(symbol, "quote", {}, stock_data)
+        return stock_data
     except Exception as e:
         return None
 
 
-@st.cache_data(ttl=300)
-def fetch_historical_data(symbol: str, period: str = "2y") -> Optional[pd.DataFrame]:
-    """Fetch historical price data."""
+@st.cache_data(ttl=FETCH_TTL)
+def fetch_stock_data(symbol: str, _future: Optional[Future] = None) -> Optional[Dict[str, Any]]:
+    """Fetch current stock data using yfinance.
+    
+    _future, left out of the cache key, hands over a load already started by
+    fetch_all so a cold miss doesn't fetch twice.
+    """
+    if _future is not None:
+        return _future.result()
+    return _load_stock_data(symbol)
+
+
+class PriceHistory(NamedTuple):
+    """Daily closes as parallel arrays, sorted by date.
+    
+    Lookups only need searchsorted over the dates and a gather from the closes,
+    so the DataFrame is dropped once it has been written to the disk cache.
+    """
+    dates: np.ndarray   # datetime64, tz-naive
+    closes: np.ndarray  # float64
+
+
+def _load_history(symbol: str, period: str) -> Optional[PriceHistory]:
+    """Load historical price data from the disk cache or yfinance."""
+    cached = file_cache.get_frame(symbol, "history", {"period": period}, HISTORY_TTL)
+    if cached is not None:
+        return _to_price_history(cached)
+    
     try:
-        ticker = yf.Ticker(symbol)
-        hist = ticker.history(period=period)
+        # Dividend and split columns are dropped anyway, so skip fetching them
+        hist = yf.Ticker(symbol).history(period=period, actions=False)
         if hist.empty:
             return None
-        hist.index = hist.index.tz_localize(None)
-        return hist
+        hist = _prepare_history(hist)
+        file_cache.set_frame(symbol, "history", {"period": period}, hist)
+        return _to_price_history(hist)
     except:
         return None
 
 
-def get_price_at_date(hist: pd.DataFrame, target_date: datetime) -> Optional[float]:
-    """Get the closing price closest to a target date."""
+@st.cache_resource(ttl=FETCH_TTL)
+def fetch_historical_data(symbol: str, period: str = "2y", _future: Optional[Future] = None) -> Optional[PriceHistory]:
+    """Fetch historical price data.
+    
+    Cached as a resource, so every session gets the same arrays with no pickle
+    round-trip per rerun. The arrays are flagged read-only. _future works as in
+    fetch_stock_data.
+    """
+    if _future is not None:
+        return _future.result()
+    return _load_history(symbol, period)
+
+
+@st.cache_resource(ttl=FETCH_TTL)
+def fetch_many_history(symbols: Tuple[str, ...], period: str = "2y") -> Dict[str, PriceHistory]:
+    """Fetch historical price data for several tickers in one batched request.
+    
+    Symbols already in the disk cache are served from it; the rest go through a
+    single yf.download call. Symbols with no data are left out of the result.
+    Shares fetch_historical_data's disk cache entries and read-only contract,
+    but its in-memory tier is separate, keyed on the whole symbol tuple.
+    Not called by the app yet; it is there for multi-ticker views.
+    """
+    histories = {}
+    missing = []
+    for symbol in symbols:
+        cached = file_cache.get_frame(symbol, "history", {"period": period}, HISTORY_TTL)
+        if cached is not None:
+            histories[symbol] = _to_price_history(cached)
+        else:
+            missing.append(symbol)
+    
+    if not missing:
+        return histories
+    
     try:
-        target_ts = pd.Timestamp(target_date)
-        closest_idx = hist.index.get_indexer([target_ts], method='nearest')[0]
-        if 0 <= closest_idx < len(hist):
-            return round(hist.iloc[closest_idx]['Close'], 2)
-        return None
-    except:
-        return None
+        data = yf.download(
+            " ".join(missing),
+            period=period,
+            group_by='ticker',
+            auto_adjust=True,
+            actions=False,
+            threads=True,
+            progress=False,
+        )
+    except Exception:
+        return histories
+    
+    for symbol in missing:
+        try:
+            hist = data[symbol] if isinstance(data.columns, pd.MultiIndex) else data
+            # Rows are aligned across tickers, so drop other exchanges' trading days
+            hist = hist.dropna(subset=['Close'])
+        except KeyError:
+            continue
+        if hist.empty:
+            continue
+        hist = _prepare_history(hist)
+        file_cache.set_frame(symbol, "history", {"period": period}, hist)
+        histories[symbol] = _to_price_history(hist)
+    
+    return histories
+
+
+@st.cache_resource
+def _fetched_at() -> Dict[Tuple[str, str], float]:
+    """Process-wide record of when fetch_all last started loading each (symbol, period)."""
+    return {}
+
+
+def fetch_all(symbol: str, period: str = "2y") -> Tuple[Optional[Dict[str, Any]], Optional[PriceHistory]]:
+    """Fetch the quote and price history for a symbol in one call.
+    
+    When both were loaded within FETCH_TTL they are warm cache hits, so the
+    cached fetchers are called directly. Otherwise the two loads are
+    independent network requests and run concurrently on worker threads, then
+    get handed to the cached fetchers so later reruns hit the cache.
+    
+    The record is a second clock next to the fetchers' own TTLs. It is stamped
+    before the loads start, so it expires no later than the entries they
+    create; if those are evicted early (e.g. a cache clear) a "warm" rerun just
+    loads serially until the record expires.
+    """
+    fetched_at = _fetched_at()
+    key = (symbol, period)
+    started = time.time()
+    if started - fetched_at.get(key, 0.0) < FETCH_TTL:
+        return fetch_stock_data(symbol), fetch_historical_data(symbol, period)
+    
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        stock_future = executor.submit(_load_stock_data, symbol)
+        hist_future = executor.submit(_load_history, symbol, period)
+        result = (
+            fetch_stock_data(symbol, _future=stock_future),
+            fetch_historical_data(symbol, period, _future=hist_future),
+        )
+    
+    # Keep the record bounded to pairs that are still warm; other sessions may
+    # write concurrently, so iterate over a snapshot
+    for stale, t in list(fetched_at.items()):
+        if started - t >= FETCH_TTL:
+            fetched_at.pop(stale, None)
+    fetched_at[key] = started
+    return result
+
+
+# Yahoo's fixed history periods, shortest first, with the days each one covers
+HISTORY_PERIODS: Final = (("6mo", 182), ("1y", 365), ("2y", 730), ("5y", 1826), ("10y", 3652))
+
+
+def history_period(start: date, today: date) -> str:
+    """Return the shortest Yahoo history period that reaches back to start.
+    
+    Snapping to fixed periods instead of exact start/end dates keeps the cache
+    keys stable, so moving the grant date or a new day doesn't force a refetch.
+    """
+    days = (today - start).days
+    for period, span in HISTORY_PERIODS:
+        if days <= span:
+            return period
+    return "max"
+
 
+def _prepare_history(hist: pd.DataFrame) -> pd.DataFrame:
+    """Reduce a raw yfinance frame to what gets cached: a tz-naive float64 Close."""
+    # Only closing prices are read. They stay float64: float32 can't hold cents
+    # above ~$262k (BRK-A), and at a few hundred rows the savings are negligible
+    hist = hist[['Close']].astype('float64')
+    hist.index = hist.index.tz_localize(None)
+    return hist
 
-def get_actual_date_used(hist: pd.DataFrame, target_date: datetime) -> Optional[datetime]:
-    """Get the actual trading date closest to target date."""
+
+def _to_price_history(hist: pd.DataFrame) -> PriceHistory:
+    """Split a prepared frame into the read-only arrays that get cached in memory."""
+    dates = hist.index.to_numpy()
+    closes = hist['Close'].to_numpy()
+    dates.setflags(write=False)
+    closes.setflags(write=False)
+    return PriceHistory(dates, closes)
+
+
+def lookup_dates(hist: PriceHistory, target_dates: List[datetime]) -> Optional[Tuple[List[float], List[datetime]]]:
+    """Get the closing prices and actual trading dates closest to each target date."""
     try:
-        target_ts = pd.Timestamp(target_date)
-        closest_idx = hist.index.get_indexer([target_ts], method='nearest')[0]
-        if 0 <= closest_idx < len(hist):
-            return hist.index[closest_idx].to_pydatetime()
-        return None
-    except:
+        index_np = hist.dates
+        targets = np.array(target_dates, dtype=index_np.dtype)
+        
+        # One binary search for every target, then step back to the earlier
+        # neighbour when it is strictly closer (ties go to the later date)
+        right = np.minimum(np.searchsorted(index_np, targets), len(index_np) - 1)
+        left = np.maximum(right - 1, 0)
+        idx = np.where(targets - index_np[left] < index_np[right] - targets, left, right)
+        
+        prices = [round(float(price), 2) for price in hist.closes[idx]]
+        actual_dates = index_np[idx].astype('datetime64[us]').tolist()
+        return prices, actual_dates
+    except Exception:
         return None
 
 
+def add_months(date: datetime, months: int) -> datetime:
+    """Shift a date by whole months, clamping to the end of shorter months."""
+    month_index = date.month - 1 + months
+    year = date.year + month_index // 12
+    month = month_index % 12 + 1
+    day = min(date.day, calendar.monthrange(year, month)[1])
+    return date.replace(year=year, month=month, day=day)
+
+
 # ============================================================
 # ESPP Calculation
 # ============================================================
-def calculate_purchase(
-    grant_price: float,
-    purchase_price: float,
-    total_contribution: float,
-    discount_rate: float,
+def _purchase_kernel(
+    grant_price,
+    purchase_price,
+    total_contribution,
+    discount_rate,
     has_lookback: bool
-) -> Dict[str, Any]:
-    """Calculate purchase details for a single ESPP purchase."""
+) -> Tuple[np.ndarray, ...]:
+    """Core ESPP purchase math; price and contribution args may be scalars or arrays.
+    
+    Kept free of Python branching so scenario sweeps can broadcast over whole
+    NumPy arrays in a single call.
+    """
+    grant_price = np.asarray(grant_price, dtype=float)
+    purchase_price = np.asarray(purchase_price, dtype=float)
+    total_contribution = np.asarray(total_contribution, dtype=float)
     
     if has_lookback:
-        effective_price = min(grant_price, purchase_price)
-        lookback_used = 'grant' if grant_price <= purchase_price else 'purchase'
+        effective_price = np.minimum(grant_price, purchase_price)
     else:
         effective_price = purchase_price
-        lookback_used = 'purchase'
     
     discounted_price = effective_price * (1 - discount_rate / 100)
     
-    max_shares = total_contribution / discounted_price
-    whole_shares = math.floor(max_shares)
+    whole_shares = np.floor(total_contribution / discounted_price)
     
     cost_of_shares = whole_shares * discounted_price
     cash_left_over = total_contribution - cost_of_shares
@@ -478,84 +372,356 @@ def calculate_purchase(
     total_proceeds = whole_shares * purchase_price
     
     gain_dollars = total_proceeds - cost_of_shares
-    gain_percent = (gain_dollars / cost_of_shares * 100) if cost_of_shares > 0 else 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        gain_percent = np.where(cost_of_shares > 0, gain_dollars / cost_of_shares * 100, 0.0)
     
     fmv_used = whole_shares * grant_price
     
-    return {
-        "effective_price": round(effective_price, 2),
-        "discounted_price": round(discounted_price, 2),
-        "lookback_used": lookback_used,
-        "whole_shares": whole_shares,
-        "cost_of_shares": round(cost_of_shares, 2),
-        "cash_left_over": round(cash_left_over, 2),
-        "total_proceeds": round(total_proceeds, 2),
-        "gain_dollars": round(gain_dollars, 2),
-        "gain_percent": round(gain_percent, 1),
-        "fmv_used": round(fmv_used, 2),
-    }
+    return (
+        effective_price,
+        discounted_price,
+        whole_shares,
+        cost_of_shares,
+        cash_left_over,
+        total_proceeds,
+        gain_dollars,
+        gain_percent,
+        fmv_used,
+    )
+
+
+class PurchaseResult(NamedTuple):
+    """Result of calculate_purchase, with attribute access at the call sites."""
+    effective_price: float
+    discounted_price: float
+    lookback_used: str
+    whole_shares: int
+    cost_of_shares: float
+    cash_left_over: float
+    total_proceeds: float
+    gain_dollars: float
+    gain_percent: float
+    fmv_used: float
+
+
+def calculate_purchase(
+    grant_price: float,
+    purchase_price: float,
+    total_contribution: float,
+    discount_rate: float,
+    has_lookback: bool
+) -> PurchaseResult:
+    """Calculate purchase details for a single ESPP purchase."""
+    
+    if has_lookback:
+        lookback_used = 'grant' if grant_price <= purchase_price else 'purchase'
+    else:
+        lookback_used = 'purchase'
+    
+    (
+        effective_price,
+        discounted_price,
+        whole_shares,
+        cost_of_shares,
+        cash_left_over,
+        total_proceeds,
+        gain_dollars,
+        gain_percent,
+        fmv_used,
+    ) = _purchase_kernel(grant_price, purchase_price, total_contribution, discount_rate, has_lookback)
+    
+    # Full precision; the display format specs do the rounding
+    return PurchaseResult(
+        effective_price=float(effective_price),
+        discounted_price=float(discounted_price),
+        lookback_used=lookback_used,
+        whole_shares=int(whole_shares),
+        cost_of_shares=float(cost_of_shares),
+        cash_left_over=float(cash_left_over),
+        total_proceeds=float(total_proceeds),
+        gain_dollars=float(gain_dollars),
+        gain_percent=float(gain_percent),
+        fmv_used=float(fmv_used),
+    )
 
 
 # ============================================================
 # Chart Functions
 # ============================================================
-def create_waterfall_chart(cost_basis: float, gain: float, dark_mode: bool):
-    """Create a horizontal stacked bar chart showing cost + gain = proceeds."""
-    
-    colors = {
-        'cost': '#444444' if dark_mode else '#e0e0e0',
-        'gain': '#39ff14' if dark_mode else '#32cd32',
-        'text_cost': '#888888' if dark_mode else '#666666',
-        'text_gain': '#1a1a1a' if dark_mode else '#ffffff',
-        'bg': 'rgba(0,0,0,0)',
-    }
-    
-    fig = go.Figure()
-    
-    # Cost basis bar
-    fig.add_trace(go.Bar(
-        y=['Proceeds'],
-        x=[cost_basis],
-        orientation='h',
-        name='Your Cost',
-        marker_color=colors['cost'],
-        text=[f'${cost_basis:,.0f}'],
-        textposition='inside',
-        textfont=dict(color=colors['text_cost'], size=14, family='Space Mono'),
-        hoverinfo='skip',
-    ))
+def create_waterfall_html(cost_basis: float, gain: float, dark_mode: bool) -> str:
+    """Create a horizontal stacked bar showing cost + gain = proceeds.
     
-    # Gain bar
-    fig.add_trace(go.Bar(
-        y=['Proceeds'],
-        x=[gain],
-        orientation='h',
-        name='Gain',
-        marker_color=colors['gain'],
-        text=[f'+${gain:,.0f}'],
-        textposition='inside',
-        textfont=dict(color=colors['text_gain'], size=14, family='Space Mono'),
-        hoverinfo='skip',
-    ))
+    Plain flexbox rather than a Plotly figure: two proportional segments need
+    no chart runtime, and the bar ships in the same st.markdown as the cards.
+    """
+    
+    colors = BAR_COLORS[dark_mode]
+    
+    # Labels sit inside the end of each segment and clip when it is too narrow
+    segment = (
+        'min-width: 0; overflow: hidden; white-space: nowrap; display: flex; '
+        'align-items: center; justify-content: flex-end; padding: 0 8px;'
+    )
     
-    fig.update_layout(
-        barmode='stack',
-        showlegend=False,
-        height=70,
-        margin=dict(l=0, r=0, t=0, b=0),
-        paper_bgcolor=colors['bg'],
-        plot_bgcolor=colors['bg'],
-        xaxis=dict(visible=False),
-        yaxis=dict(visible=False),
+    # A loss has no segment of its own; the summary below shows the sign
+    gain_segment = (
+        f'''<div style="flex: {gain:.2f} 0 0; background: {colors['gain']}; color: {colors['text_gain']}; {segment}">+${gain:,.0f}</div>'''
+        if gain > 0 else ''
     )
     
-    return fig
+    return f'''
+    <div style="display: flex; height: 56px; margin: 8px 0 16px; font-family: Space Mono, monospace; font-size: 14px;">
+        <div style="flex: {max(cost_basis, 0):.2f} 0 0; background: {colors['cost']}; color: {colors['text_cost']}; {segment}">${cost_basis:,.0f}</div>
+        {gain_segment}
+    </div>
+    '''
+
+
+# ============================================================
+# HTML Fragments
+# ============================================================
+# Pure builders for the cards in main(). Like calculate_purchase and
+# create_waterfall_html they are deliberately not memoized: an st.cache_data hit
+# (hashing the args, unpickling the result) costs far more than the work itself.
+def _join_html(fragments: List[str]) -> str:
+    """Join fragments into one st.markdown body, each as a single raw HTML block.
+    
+    Each fragment is dedented on its own and loses its whitespace-only lines.
+    Markdown ends an HTML block at a blank line and treats the indented lines
+    after it as a code block, as happened with an empty badge slot.
+    """
+    blocks = []
+    for fragment in fragments:
+        lines = textwrap.dedent(fragment).splitlines()
+        blocks.append("\n".join(line for line in lines if line.strip()))
+    return "\n\n".join(blocks)
+
+
+def _render_stock_card(symbol: str, company_name: str, current_price: float, day_change_pct: float) -> str:
+    """Render the ticker, company name, current price and day change card."""
+    change_sign = "+" if day_change_pct >= 0 else ""
+    
+    return f'''
+    <div class="card">
+        <div style="display: flex; justify-content: space-between; align-items: flex-start;">
+            <div>
+                <span class="big-number">{symbol}</span>
+                <span class="tag" style="margin-left: 12px;">{change_sign}{day_change_pct:.1f}%</span>
+                <div style="color: var(--text-muted); margin-top: 4px;">{company_name}</div>
+            </div>
+            <div style="text-align: right;">
+                <div class="big-number">${current_price:,.2f}</div>
+                <div style="color: var(--text-muted); font-size: 14px;">current price</div>
+            </div>
+        </div>
+    </div>
+    '''
+
+
+def _render_proceeds_card(proceeds_display: str) -> str:
+    """Render the total proceeds headline card."""
+    return f'''
+    <div class="card">
+        <div style="display: flex; justify-content: space-between; align-items: baseline; margin-bottom: 8px;">
+            <span class="label">Total Proceeds</span>
+            <span class="big-number">${proceeds_display}</span>
+        </div>
+    </div>
+    '''
+
+
+def _render_proceeds_summary(
+    gain_percent: float,
+    whole_shares: int,
+    discounted_display: str,
+    discount_rate: float,
+    cash_back_display: str,
+    dark_mode: bool
+) -> str:
+    """Render the bar legend and the shares, discount and cash back line."""
+    colors = BAR_COLORS[dark_mode]
+    accent_color = colors['gain']
+    muted_color = colors['text_cost']
+    bar_color = colors['cost']
+    
+    return f'''
+    <div style="display: flex; justify-content: space-between; margin-bottom: 16px; font-size: 14px;">
+        <div style="display: flex; align-items: center; gap: 8px;">
+            <div style="width: 12px; height: 12px; background: {bar_color};"></div>
+            <span style="color: {muted_color};">Your Cost</span>
+        </div>
+        <div style="display: flex; align-items: center; gap: 8px;">
+            <div style="width: 12px; height: 12px; background: {accent_color};"></div>
+            <span class="highlight">Gain +{gain_percent:.1f}%</span>
+        </div>
+    </div>
+    <hr class="divider">
+    <div style="display: flex; justify-content: space-between; font-size: 14px; color: var(--text);">
+        <div>
+            <strong>{whole_shares}</strong> shares @ <strong>${discounted_display}</strong>
+            <span style="color: {muted_color};"> ({discount_rate}% discount)</span>
+        </div>
+        <div style="color: {muted_color};">
+            ${cash_back_display} cash back
+        </div>
+    </div>
+    '''
+
+
+def _render_grant_card(
+    date_label: str,
+    grant_price: float,
+    discounted_display: str,
+    discount_rate: float,
+    highlighted: bool
+) -> str:
+    """Render the grant date card, highlighted when the lookback uses it."""
+    highlight_class = 'card-highlight' if highlighted else ''
+    badge = '<span class="lookback-badge">✓ LOOKBACK</span>' if highlighted else ''
+    price_class = 'highlight-alt' if highlighted else ''
+    discount_line = f'<div style="color: var(--accent-alt); font-size: 12px; margin-top: 8px; font-family: Space Mono, monospace;">→ ${discounted_display} after {discount_rate}% discount</div>' if highlighted else ''
+    
+    return f'''
+    <div class="card {highlight_class}" style="position: relative;">
+        {badge}
+        <div class="label">Grant Date</div>
+        <div class="medium-number">{date_label}</div>
+        <div style="margin-top: 8px;">
+            <span class="small-number {price_class}">${grant_price:,.2f}</span>
+            <span style="color: var(--text-muted); font-size: 14px; margin-left: 8px;">close</span>
+        </div>
+        {discount_line}
+    </div>
+    '''
+
+
+def _render_purchase_card(
+    date_label: str,
+    purchase_price: float,
+    discounted_display: str,
+    discount_rate: float,
+    highlighted: bool,
+    is_future_purchase: bool
+) -> str:
+    """Render the purchase date card, highlighted when the lookback uses it."""
+    if highlighted:
+        return f'''
+        <div class="card card-highlight" style="position: relative;">
+            <span class="lookback-badge">✓ LOOKBACK</span>
+            <div class="label">Purchase Date</div>
+            <div class="medium-number">{date_label}</div>
+            <div style="margin-top: 8px;">
+                <span class="small-number highlight-alt">${purchase_price:,.2f}</span>
+                <span style="color: var(--text-muted); font-size: 14px; margin-left: 8px;">{"current" if is_future_purchase else "close"}</span>
+            </div>
+            <div style="color: var(--accent-alt); font-size: 12px; margin-top: 8px; font-family: Space Mono, monospace;">→ ${discounted_display} after {discount_rate}% discount</div>
+        </div>
+        '''
+    
+    return f'''
+    <div class="card" style="position: relative;">
+        <div class="label">Purchase Date</div>
+        <div class="medium-number">{date_label}</div>
+        <div style="margin-top: 8px;">
+            <span class="small-number">${purchase_price:,.2f}</span>
+            <span style="color: var(--text-muted); font-size: 14px; margin-left: 8px;">{"current" if is_future_purchase else "close"}</span>
+        </div>
+    </div>
+    '''
+
+
+def _render_breakdown_card(
+    contribution: float,
+    whole_shares: int,
+    cost_of_shares: float,
+    proceeds_display: str,
+    cash_back_display: str
+) -> str:
+    """Render the contribution, shares, cost, value and cash breakdown card."""
+    return f'''
+    <div class="card">
+        <div class="label" style="margin-bottom: 12px;">Purchase Breakdown</div>
+        <div class="inline-stat">
+            <span>Your Contribution</span>
+            <span class="small-number">${contribution:,.2f}</span>
+        </div>
+        <div class="inline-stat">
+            <span>Shares Purchased</span>
+            <span class="small-number">{whole_shares}</span>
+        </div>
+        <div class="inline-stat">
+            <span>Cost Basis</span>
+            <span>${cost_of_shares:,.2f}</span>
+        </div>
+        <div class="inline-stat">
+            <span>Market Value</span>
+            <span class="highlight-alt">${proceeds_display}</span>
+        </div>
+        <div class="inline-stat">
+            <span>Cash Returned</span>
+            <span>${cash_back_display}</span>
+        </div>
+    </div>
+    '''
+
+
+def _render_irs_card(
+    current_year: int,
+    total_fmv_used: float,
+    usage_pct: float,
+    remaining_fmv: float,
+    recommended_pct: int
+) -> str:
+    """Render the IRS limit usage bar and next-offering recommendation."""
+    fmv_used_display = f"{total_fmv_used:,.2f}"
+    
+    return f'''
+    <div class="card">
+        <div style="display: flex; justify-content: space-between; align-items: baseline;">
+            <span class="label">IRS Limit ({current_year})</span>
+            <span style="font-size: 14px; color: var(--text-muted);">
+                \\${fmv_used_display} of \\$25,000
+            </span>
+        </div>
+        <div class="progress-container">
+            <div class="progress-fill" style="width: {usage_pct}%;"></div>
+        </div>
+        <div style="display: flex; justify-content: space-between; margin-top: 12px; font-size: 14px;">
+            <span>
+                <span class="highlight-alt" style="font-weight: bold;">${remaining_fmv:,.2f}</span> remaining
+            </span>
+            <span>
+                Next offering: <strong>{recommended_pct:.0f}%</strong> recommended
+            </span>
+        </div>
+    </div>
+    '''
+
+
+def _render_footer(current_year: int) -> str:
+    """Render the page footer."""
+    return f'''
+    <div class="footer">
+        <div>For educational purposes only. Consult a tax professional.</div>
+        <div class="footer-brand">ESPP OPTIMIZER v2.0 // {current_year}</div>
+    </div>
+    '''
 
 
 # ============================================================
 # Main App
 # ============================================================
+def _toggle_dark_mode():
+    """Flip the theme; used as the toggle button's on_click callback."""
+    st.session_state.dark_mode = not st.session_state.dark_mode
+
+
 def main():
+    # Read the clock once per rerun
+    now = datetime.now()
+    today = now.date()
+    current_year = now.year
+    
     # Initialize dark mode in session state
     if 'dark_mode' not in st.session_state:
         st.session_state.dark_mode = True
@@ -569,13 +735,16 @@ def main():
     col_title, col_toggle = st.columns([4, 1])
     
     with col_title:
-        st.markdown('<div class="main-header">ESPP OPTIMIZER_</div>', unsafe_allow_html=True)
-        st.markdown('<div class="sub-header">Employee Stock Purchase Plan Calculator</div>', unsafe_allow_html=True)
+        st.markdown(
+            '<div class="main-header">ESPP OPTIMIZER_</div>'
+            '<div class="sub-header">Employee Stock Purchase Plan Calculator</div>',
+            unsafe_allow_html=True
+        )
     
     with col_toggle:
-        if st.button('🌙 DARK' if not st.session_state.dark_mode else '☀️ LIGHT'):
-            st.session_state.dark_mode = not st.session_state.dark_mode
-            st.rerun()
+        # on_click runs before the rerun the click triggers, so this single
+        # pass already renders the new theme; no second st.rerun() needed
+        st.button('🌙 DARK' if not st.session_state.dark_mode else '☀️ LIGHT', on_click=_toggle_dark_mode)
     
     # ============================================================
     # Inputs - Compact Row
@@ -591,7 +760,7 @@ def main():
             grant_date = st.date_input(
                 "Grant Date",
                 value=datetime(2025, 9, 1),
-                max_value=datetime.now().date()
+                max_value=today
             )
             contribution_pct = st.slider("Contribution %", 1, 15, 10)
         
@@ -603,8 +772,10 @@ def main():
         prior_fmv = st.number_input("Prior FMV Used This Year", value=0.0, step=100.0)
     
     # Fetch data
-    stock_data = fetch_stock_data(ticker_input)
-    hist_data = fetch_historical_data(ticker_input)
+    with st.spinner(f"Fetching {ticker_input}..."):
+        # A couple of weeks of margin so the nearest trading day to the grant date is included
+        period = history_period(grant_date - timedelta(days=14), today)
+        stock_data, hist_data = fetch_all(ticker_input, period)
     
     if stock_data is None or hist_data is None:
         st.error(f"Could not fetch data for {ticker_input}. Please check the ticker.")
@@ -612,22 +783,23 @@ def main():
     
     # Calculate dates and prices
     grant_datetime = datetime.combine(grant_date, datetime.min.time())
-    purchase_date = grant_datetime + relativedelta(months=purchase_period)
+    purchase_date = add_months(grant_datetime, purchase_period)
     
-    grant_price = get_price_at_date(hist_data, grant_datetime)
-    actual_grant_date = get_actual_date_used(hist_data, grant_datetime)
+    lookup = lookup_dates(hist_data, [grant_datetime, purchase_date])
     
-    if purchase_date.date() >= datetime.now().date():
+    if lookup is None:
+        st.error("Could not fetch grant date price.")
+        return
+    
+    (grant_price, purchase_close), (actual_grant_date, _) = lookup
+    
+    if purchase_date.date() >= today:
         purchase_price = stock_data['currentPrice']
         is_future_purchase = True
     else:
-        purchase_price = get_price_at_date(hist_data, purchase_date) or stock_data['currentPrice']
+        purchase_price = purchase_close or stock_data['currentPrice']
         is_future_purchase = False
     
-    if grant_price is None:
-        st.error("Could not fetch grant date price.")
-        return
-    
     # Calculate contribution
     periods_per_year = 12 / purchase_period
     contribution = (annual_salary * contribution_pct / 100) / periods_per_year
@@ -641,215 +813,126 @@ def main():
         has_lookback=has_lookback
     )
     
+    # Amounts shown on more than one card are formatted once here
+    discounted_display = f"{purchase.discounted_price:,.2f}"
+    proceeds_display = f"{purchase.total_proceeds:,.2f}"
+    cash_back_display = f"{purchase.cash_left_over:,.2f}"
+    
     # ============================================================
     # Stock Card
     # ============================================================
-    change_sign = "+" if stock_data['dayChangePercent'] >= 0 else ""
-    
-    st.markdown(f'''
-    <div class="card">
-        <div style="display: flex; justify-content: space-between; align-items: flex-start;">
-            <div>
-                <span class="big-number">{stock_data["symbol"]}</span>
-                <span class="tag" style="margin-left: 12px;">{change_sign}{stock_data["dayChangePercent"]:.1f}%</span>
-                <div style="color: var(--text-muted); margin-top: 4px;">{stock_data["companyName"]}</div>
-            </div>
-            <div style="text-align: right;">
-                <div class="big-number">${stock_data["currentPrice"]:,.2f}</div>
-                <div style="color: var(--text-muted); font-size: 14px;">current price</div>
-            </div>
-        </div>
-    </div>
-    ''', unsafe_allow_html=True)
+    # Every card and the proceeds bar are collected and emitted in a single
+    # st.markdown call, rather than one websocket delta per card
+    parts: List[str] = []
+    
+    parts.append(_render_stock_card(
+        stock_data['symbol'],
+        stock_data['companyName'],
+        stock_data['currentPrice'],
+        stock_data['dayChangePercent']
+    ))
     
     # ============================================================
     # Proceeds Waterfall Card
     # ============================================================
-    st.markdown(f'''
-    <div class="card">
-        <div style="display: flex; justify-content: space-between; align-items: baseline; margin-bottom: 8px;">
-            <span class="label">Total Proceeds</span>
-            <span class="big-number">${purchase["total_proceeds"]:,.2f}</span>
-        </div>
-    </div>
-    ''', unsafe_allow_html=True)
+    parts.append(_render_proceeds_card(proceeds_display))
     
     # Waterfall chart
-    fig = create_waterfall_chart(
-        purchase['cost_of_shares'],
-        purchase['gain_dollars'],
+    parts.append(create_waterfall_html(
+        purchase.cost_of_shares,
+        purchase.gain_dollars,
         st.session_state.dark_mode
-    )
-    st.plotly_chart(fig, use_container_width=True, config={'displayModeBar': False})
+    ))
     
     # Legend and summary
-    accent_color = '#39ff14' if st.session_state.dark_mode else '#32cd32'
-    muted_color = '#888888' if st.session_state.dark_mode else '#666666'
-    bar_color = '#444444' if st.session_state.dark_mode else '#e0e0e0'
-    
-    st.markdown(f'''
-    <div style="display: flex; justify-content: space-between; margin-bottom: 16px; font-size: 14px;">
-        <div style="display: flex; align-items: center; gap: 8px;">
-            <div style="width: 12px; height: 12px; background: {bar_color};"></div>
-            <span style="color: {muted_color};">Your Cost</span>
-        </div>
-        <div style="display: flex; align-items: center; gap: 8px;">
-            <div style="width: 12px; height: 12px; background: {accent_color};"></div>
-            <span class="highlight">Gain +{purchase["gain_percent"]:.1f}%</span>
-        </div>
-    </div>
-    <hr class="divider">
-    <div style="display: flex; justify-content: space-between; font-size: 14px; color: var(--text);">
-        <div>
-            <strong>{purchase["whole_shares"]}</strong> shares @ <strong>${purchase["discounted_price"]:,.2f}</strong>
-            <span style="color: {muted_color};"> ({discount_rate}% discount)</span>
-        </div>
-        <div style="color: {muted_color};">
-            ${purchase["cash_left_over"]:.2f} cash back
-        </div>
-    </div>
-    ''', unsafe_allow_html=True)
+    parts.append(_render_proceeds_summary(
+        purchase.gain_percent,
+        purchase.whole_shares,
+        discounted_display,
+        discount_rate,
+        cash_back_display,
+        st.session_state.dark_mode
+    ))
     
     # ============================================================
     # Date Cards with Lookback Highlight
     # ============================================================
-    col_grant, col_purchase = st.columns(2)
-    
-    grant_highlighted = has_lookback and purchase['lookback_used'] == 'grant'
-    purchase_highlighted = has_lookback and purchase['lookback_used'] == 'purchase'
-    
-    with col_grant:
-        highlight_class = 'card-highlight' if grant_highlighted else ''
-        badge = '<span class="lookback-badge">✓ LOOKBACK</span>' if grant_highlighted else ''
-        price_class = 'highlight-alt' if grant_highlighted else ''
-        discount_line = f'<div style="color: var(--accent-alt); font-size: 12px; margin-top: 8px; font-family: Space Mono, monospace;">→ ${purchase["discounted_price"]:.2f} after {discount_rate}% discount</div>' if grant_highlighted else ''
-        
-        st.markdown(f'''
-        <div class="card {highlight_class}" style="position: relative;">
-            {badge}
-            <div class="label">Grant Date</div>
-            <div class="medium-number">{actual_grant_date.strftime("%b %d, %Y") if actual_grant_date else "N/A"}</div>
-            <div style="margin-top: 8px;">
-                <span class="small-number {price_class}">${grant_price:,.2f}</span>
-                <span style="color: var(--text-muted); font-size: 14px; margin-left: 8px;">close</span>
-            </div>
-            {discount_line}
-        </div>
-        ''', unsafe_allow_html=True)
-    
-    with col_purchase:
-        if purchase_highlighted:
-            st.markdown(f'''
-            <div class="card card-highlight" style="position: relative;">
-                <span class="lookback-badge">✓ LOOKBACK</span>
-                <div class="label">Purchase Date</div>
-                <div class="medium-number">{purchase_date.strftime("%b %d, %Y")}</div>
-                <div style="margin-top: 8px;">
-                    <span class="small-number highlight-alt">${purchase_price:,.2f}</span>
-                    <span style="color: var(--text-muted); font-size: 14px; margin-left: 8px;">{"current" if is_future_purchase else "close"}</span>
-                </div>
-                <div style="color: var(--accent-alt); font-size: 12px; margin-top: 8px; font-family: Space Mono, monospace;">→ ${purchase["discounted_price"]:.2f} after {discount_rate}% discount</div>
-            </div>
-            ''', unsafe_allow_html=True)
-        else:
-            st.markdown(f'''
-            <div class="card" style="position: relative;">
-                <div class="label">Purchase Date</div>
-                <div class="medium-number">{purchase_date.strftime("%b %d, %Y")}</div>
-                <div style="margin-top: 8px;">
-                    <span class="small-number">${purchase_price:,.2f}</span>
-                    <span style="color: var(--text-muted); font-size: 14px; margin-left: 8px;">{"current" if is_future_purchase else "close"}</span>
-                </div>
-            </div>
-            ''', unsafe_allow_html=True)
-
+    grant_highlighted = has_lookback and purchase.lookback_used == 'grant'
+    purchase_highlighted = has_lookback and purchase.lookback_used == 'purchase'
+    
+    parts.append('<div class="card-row">')
+    parts.append(_render_grant_card(
+        actual_grant_date.strftime("%b %d, %Y") if actual_grant_date else "N/A",
+        grant_price,
+        discounted_display,
+        discount_rate,
+        grant_highlighted
+    ))
+    parts.append(_render_purchase_card(
+        purchase_date.strftime("%b %d, %Y"),
+        purchase_price,
+        discounted_display,
+        discount_rate,
+        purchase_highlighted,
+        is_future_purchase
+    ))
+    parts.append('</div>')
     
     # ============================================================
     # Purchase Breakdown
     # ============================================================
-    st.markdown(f'''
-    <div class="card">
-        <div class="label" style="margin-bottom: 12px;">Purchase Breakdown</div>
-        <div class="inline-stat">
-            <span>Your Contribution</span>
-            <span class="small-number">${contribution:,.2f}</span>
-        </div>
-        <div class="inline-stat">
-            <span>Shares Purchased</span>
-            <span class="small-number">{purchase["whole_shares"]}</span>
-        </div>
-        <div class="inline-stat">
-            <span>Cost Basis</span>
-            <span>${purchase["cost_of_shares"]:,.2f}</span>
-        </div>
-        <div class="inline-stat">
-            <span>Market Value</span>
-            <span class="highlight-alt">${purchase["total_proceeds"]:,.2f}</span>
-        </div>
-        <div class="inline-stat">
-            <span>Cash Returned</span>
-            <span>${purchase["cash_left_over"]:.2f}</span>
-        </div>
-    </div>
-    ''', unsafe_allow_html=True)
+    parts.append(_render_breakdown_card(
+        contribution,
+        purchase.whole_shares,
+        purchase.cost_of_shares,
+        proceeds_display,
+        cash_back_display
+    ))
     
     # ============================================================
     # IRS Limit
     # ============================================================
-    current_year = datetime.now().year
-    fmv_this_purchase = purchase['fmv_used']
+    fmv_this_purchase = purchase.fmv_used
     total_fmv_used = prior_fmv + fmv_this_purchase
     remaining_fmv = max(0, IRS_LIMIT - total_fmv_used)
     usage_pct = min((total_fmv_used / IRS_LIMIT) * 100, 100)
     
     # Calculate next offering recommendation
-    next_purchase_date = purchase_date + relativedelta(months=purchase_period)
+    next_purchase_date = add_months(purchase_date, purchase_period)
     crosses_new_year = next_purchase_date.year > current_year
     available_fmv = IRS_LIMIT if crosses_new_year else remaining_fmv
     
-    if available_fmv > 0:
-        estimated_grant_price = stock_data['currentPrice']
-        max_shares_by_irs = available_fmv / estimated_grant_price
-        estimated_discounted = estimated_grant_price * (1 - discount_rate / 100)
-        max_contribution_by_irs = max_shares_by_irs * estimated_discounted
-        max_annual_contribution = max_contribution_by_irs * periods_per_year
-        recommended_pct = min(15, (max_annual_contribution / annual_salary) * 100)
+    # Sweep every contribution % at once (current price as the grant/purchase estimate)
+    # and keep the largest one whose FMV still fits under the limit. FMV never
+    # falls as the rate rises, and picking by gain would collapse to 1% whenever
+    # gains tie (e.g. a 0% discount, or no rate buying a whole share)
+    estimated_price = stock_data['currentPrice']
+    pcts = np.arange(1, 16)
+    sweep_contributions = (annual_salary * pcts / 100) / periods_per_year
+    *_, sweep_fmv = _purchase_kernel(
+        estimated_price, estimated_price, sweep_contributions, discount_rate, has_lookback
+    )
+    within_limit = sweep_fmv <= available_fmv
+    
+    if available_fmv > 0 and within_limit.any():
+        recommended_pct = int(pcts[within_limit][-1])
     else:
         recommended_pct = 0
     
-    fmv_used_display = f"{total_fmv_used:,.2f}"
-    
-    st.markdown(f'''
-    <div class="card">
-        <div style="display: flex; justify-content: space-between; align-items: baseline;">
-            <span class="label">IRS Limit ({current_year})</span>
-            <span style="font-size: 14px; color: var(--text-muted);">
-                \\${fmv_used_display} of \\$25,000
-            </span>
-        </div>
-        <div class="progress-container">
-            <div class="progress-fill" style="width: {usage_pct}%;"></div>
-        </div>
-        <div style="display: flex; justify-content: space-between; margin-top: 12px; font-size: 14px;">
-            <span>
-                <span class="highlight-alt" style="font-weight: bold;">${remaining_fmv:,.2f}</span> remaining
-            </span>
-            <span>
-                Next offering: <strong>{recommended_pct:.0f}%</strong> recommended
-            </span>
-        </div>
-    </div>
-    ''', unsafe_allow_html=True)
+    parts.append(_render_irs_card(
+        current_year,
+        total_fmv_used,
+        usage_pct,
+        remaining_fmv,
+        recommended_pct
+    ))
     
     # ============================================================
     # Footer
     # ============================================================
-    st.markdown(f'''
-    <div class="footer">
-        <div>For educational purposes only. Consult a tax professional.</div>
-        <div class="footer-brand">ESPP OPTIMIZER v2.0 // {datetime.now().year}</div>
-    </div>
-    ''', unsafe_allow_html=True)
+    parts.append(_render_footer(current_year))
+    
+    st.markdown(_join_html(parts), unsafe_allow_html=True)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,241 @@
+"""
+Stylesheets for the ESPP Optimizer app.
+
+Kept out of espp_app.py because Streamlit re-executes the main script on
+every rerun; as an imported module this is assembled and minified once per
+server process, and each rerun just picks a prebuilt string.
+"""
+
+import re
+from typing import Final
+
+
+_CSS_IMPORT: Final[str] = """
+@import url('https://fonts.googleapis.com/css2?family=VT323&family=Space+Mono:wght@400;700&display=swap');
+"""
+
+# Only the palette differs between themes; every rule below reads these variables
+_CSS_ROOT_DARK: Final[str] = """
+:root {
+    --bg: #1a1a1a;
+    --card: #252525;
+    --text: #e0e0e0;
+    --text-muted: #888888;
+    --accent: #39ff14;
+    --accent-alt: #4ecdc4;
+    --border: #333333;
+    --bar-base: #444444;
+    --badge-text: #1a1a1a;
+}
+"""
+
+_CSS_ROOT_LIGHT: Final[str] = """
+:root {
+    --bg: #fafafa;
+    --card: #ffffff;
+    --text: #2d2d2d;
+    --text-muted: #666666;
+    --accent: #32cd32;
+    --accent-alt: #2a9d8f;
+    --border: #e0e0e0;
+    --bar-base: #e0e0e0;
+    --badge-text: #ffffff;
+}
+"""
+
+_CSS_BASE: Final[str] = """
+.stApp {
+    background-color: var(--bg);
+}
+
+.main-header {
+    font-family: 'VT323', monospace;
+    font-size: 36px;
+    letter-spacing: 2px;
+    color: var(--text);
+    margin-bottom: 4px;
+}
+
+.sub-header {
+    color: var(--text-muted);
+    font-size: 14px;
+    margin-bottom: 24px;
+}
+
+.card {
+    background: var(--card);
+    border: 2px solid var(--border);
+    padding: 20px;
+    margin-bottom: 16px;
+    transition: all 0.3s ease;
+}
+
+.card:hover {
+    border-color: var(--accent);
+}
+
+.card-highlight {
+    border: 2px solid var(--accent-alt) !important;
+    position: relative;
+}
+
+.lookback-badge {
+    background: var(--accent-alt);
+    color: var(--badge-text);
+    font-size: 10px;
+    padding: 2px 8px;
+    letter-spacing: 1px;
+    font-family: 'Space Mono', monospace;
+    position: absolute;
+    top: -10px;
+    left: 12px;
+}
+
+.big-number {
+    font-family: 'Space Mono', monospace;
+    font-size: 48px;
+    font-weight: 700;
+    line-height: 1;
+    letter-spacing: -2px;
+    color: var(--text);
+}
+
+.medium-number {
+    font-family: 'Space Mono', monospace;
+    font-size: 28px;
+    font-weight: 700;
+    color: var(--text);
+}
+
+.small-number {
+    font-family: 'Space Mono', monospace;
+    font-size: 18px;
+    font-weight: 700;
+}
+
+.label {
+    font-size: 14px;
+    text-transform: uppercase;
+    letter-spacing: 2px;
+    color: var(--text-muted);
+    margin-bottom: 4px;
+}
+
+.highlight {
+    color: var(--accent) !important;
+}
+
+.highlight-alt {
+    color: var(--accent-alt) !important;
+}
+
+.divider {
+    border: none;
+    border-top: 1px dashed var(--border);
+    margin: 16px 0;
+}
+
+.card-row {
+    display: flex;
+    flex-wrap: wrap;
+    gap: 16px;
+}
+
+.card-row > .card {
+    flex: 1 1 240px;
+}
+
+.inline-stat {
+    display: flex;
+    justify-content: space-between;
+    padding: 8px 0;
+    border-bottom: 1px dotted var(--border);
+    color: var(--text);
+}
+
+.inline-stat:last-child {
+    border-bottom: none;
+}
+
+.tag {
+    display: inline-block;
+    padding: 4px 12px;
+    font-size: 12px;
+    text-transform: uppercase;
+    letter-spacing: 1px;
+    border: 1px solid currentColor;
+    color: var(--accent-alt);
+}
+
+.progress-container {
+    height: 8px;
+    background: var(--border);
+    overflow: hidden;
+    margin-top: 8px;
+}
+
+.progress-fill {
+    height: 100%;
+    background: var(--accent);
+}
+
+.footer {
+    text-align: center;
+    color: var(--text-muted);
+    font-size: 12px;
+    margin-top: 32px;
+    padding-top: 16px;
+    border-top: 1px solid var(--border);
+}
+
+.footer-brand {
+    font-family: 'VT323', monospace;
+    font-size: 16px;
+    margin-top: 8px;
+}
+
+/* Hide Streamlit elements */
+#MainMenu {visibility: hidden;}
+footer {visibility: hidden;}
+.stDeployButton {display: none;}
+"""
+
+# Input overrides, applied in the dark theme only
+_CSS_INPUTS_DARK: Final[str] = """
+.stTextInput input, .stNumberInput input, .stSelectbox select {
+    background-color: var(--card) !important;
+    color: var(--text) !important;
+    border: 2px solid var(--border) !important;
+    font-family: 'Space Mono', monospace !important;
+}
+
+.stDateInput input {
+    background-color: var(--card) !important;
+    color: var(--text) !important;
+    border: 2px solid var(--border) !important;
+}
+"""
+
+_CSS_COMMENT = re.compile(r"/\*.*?\*/", re.DOTALL)
+_CSS_WHITESPACE = re.compile(r"\s+")
+_CSS_PUNCTUATION = re.compile(r"\s*([:;{},])\s*")
+
+
+def _minify_css(css: str) -> str:
+    """Strip comments and redundant whitespace so each rerun sends fewer bytes."""
+    css = _CSS_COMMENT.sub("", css)
+    css = _CSS_WHITESPACE.sub(" ", css)
+    css = _CSS_PUNCTUATION.sub(r"\1", css)
+    return css.replace(";}", "}").strip()
+
+
+_CSS_DARK: Final[str] = _minify_css(
+    f"<style>{_CSS_IMPORT}{_CSS_ROOT_DARK}{_CSS_BASE}{_CSS_INPUTS_DARK}</style>"
+)
+_CSS_LIGHT: Final[str] = _minify_css(
+    f"<style>{_CSS_IMPORT}{_CSS_ROOT_LIGHT}{_CSS_BASE}</style>"
+)
+
+
+def get_css(dark_mode: bool) -> str:
+    return _CSS_DARK if dark_mode else _CSS_LIGHT